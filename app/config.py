@@ -1,10 +1,12 @@
+from typing import Final
+
 from pydantic_settings import BaseSettings
-from functools import lru_cache
 
 
 class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite+aiosqlite:///./barbershop.db"
+    database_read_pool_size: int = 8
 
     # Gemini AI
     gemini_api_key: str = ""
@@ -22,6 +24,5 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
-@lru_cache
-def get_settings() -> Settings:
-    return Settings()
+# Carregado uma única vez no import; importe `settings` diretamente
+settings: Final[Settings] = Settings()
@@ -1,16 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from app.config import get_settings
+from app.config import settings
 
-settings = get_settings()
+# WAL + synchronous=NORMAL evita um fsync por commit e não bloqueia leitores durante escritas
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+# O modo WAL fica gravado no arquivo; conexões somente leitura não podem alterá-lo
+SQLITE_READ_PRAGMAS = tuple(p for p in SQLITE_PRAGMAS if "journal_mode" not in p)
+
+database_url = make_url(settings.database_url)
+# A aplicação é somente SQLite: agenda, histórico e busca por nome usam funções e tabelas
+# próprias dele (datetime(), printf(), json_group_array(), FTS5)
+if database_url.get_backend_name() != "sqlite":
+    raise ValueError("DATABASE_URL deve apontar para um banco SQLite (sqlite+aiosqlite)")
+is_sqlite_file = database_url.database not in (None, "", ":memory:")
+
+
+def _use_sqlite_pragmas(async_engine, pragmas: tuple[str, ...]) -> None:
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+if is_sqlite_file:
+    # Uma conexão de escrita fica aberta e é reaproveitada entre requisições; picos usam
+    # as conexões extras do overflow, que disputam o lock de escrita do SQLite (as escritas
+    # não são serializadas pelo pool). Leituras têm um pool separado, somente leitura
+    engine = create_async_engine(
+        database_url,
+        echo=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        connect_args={"check_same_thread": False},
+    )
+    read_engine = create_async_engine(
+        database_url.set(
+            database=f"file:{database_url.database}", query={"mode": "ro", "uri": "true"}
+        ),
+        echo=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.database_read_pool_size,
+        connect_args={"check_same_thread": False},
+    )
+    _use_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    _use_sqlite_pragmas(read_engine, SQLITE_READ_PRAGMAS)
+else:
+    engine = create_async_engine(
+        database_url, echo=True, connect_args={"check_same_thread": False}
+    )
+    # Banco em memória: leituras usam o mesmo engine
+    read_engine = engine
+    _use_sqlite_pragmas(engine, SQLITE_PRAGMAS)
 
-engine = create_async_engine(settings.database_url, echo=True)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+async_read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
-    pass
+    # Busca via RETURNING os valores gerados pelo banco (server_default/onupdate) no próprio
+    # INSERT/UPDATE, evitando um lazy load que não é permitido em sessões assíncronas
+    __mapper_args__ = {"eager_defaults": True}
 
 
 async def get_db():
@@ -21,6 +82,15 @@ async def get_db():
             await session.close()
 
 
+async def get_read_db():
+    """Sessão somente leitura, para endpoints de consulta (listagens, busca por nome)"""
+    async with async_read_session() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
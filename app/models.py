@@ -1,7 +1,10 @@
 from datetime import datetime, time
 from enum import Enum
 from typing import Optional
-from sqlalchemy import String, Text, Integer, ForeignKey, DateTime, Time, Enum as SQLEnum
+from sqlalchemy import (
+    DDL, Index, String, Text, Integer, ForeignKey, DateTime, Time, Enum as SQLEnum, column, event,
+    func, table
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -15,6 +18,10 @@ class AppointmentStatus(str, Enum):
     NO_SHOW = "no_show"
 
 
+# Status que ocupam a agenda do barbeiro
+ACTIVE_STATUSES = (AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED)
+
+
 class Barber(Base):
     __tablename__ = "barbers"
 
@@ -25,7 +32,9 @@ class Barber(Base):
     work_start: Mapped[time] = mapped_column(Time, default=time(9, 0))
     work_end: Mapped[time] = mapped_column(Time, default=time(19, 0))
     is_active: Mapped[bool] = mapped_column(default=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now()
+    )
 
     appointments: Mapped[list["Appointment"]] = relationship(back_populates="barber")
 
@@ -39,7 +48,9 @@ class Service(Base):
     duration_minutes: Mapped[int] = mapped_column(Integer, default=30)
     price: Mapped[float] = mapped_column(default=0.0)
     is_active: Mapped[bool] = mapped_column(default=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now()
+    )
 
     appointments: Mapped[list["Appointment"]] = relationship(back_populates="service")
 
@@ -50,8 +61,12 @@ class Customer(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     phone: Mapped[str] = mapped_column(String(20), unique=True, nullable=False, index=True)
     name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    last_interaction: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now()
+    )
+    last_interaction: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now(), onupdate=func.now()
+    )
 
     appointments: Mapped[list["Appointment"]] = relationship(back_populates="customer")
     conversations: Mapped[list["Conversation"]] = relationship(back_populates="customer")
@@ -59,6 +74,10 @@ class Customer(Base):
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Agenda do barbeiro: filtro por barbeiro + intervalo de horário + status ativo
+        Index("ix_appt_barber_time_status", "barber_id", "scheduled_at", "status"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id"), nullable=False)
@@ -71,8 +90,12 @@ class Appointment(Base):
     )
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now()
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now(), onupdate=func.now()
+    )
 
     customer: Mapped["Customer"] = relationship(back_populates="appointments")
     barber: Mapped["Barber"] = relationship(back_populates="appointments")
@@ -82,11 +105,52 @@ class Appointment(Base):
 class Conversation(Base):
     """Armazena histórico de conversas para contexto do agente"""
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Últimas mensagens do cliente: filtro por cliente, ordenado por data
+        Index("ix_conv_customer_time", "customer_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id"), nullable=False)
     role: Mapped[str] = mapped_column(String(20), nullable=False)  # "user" ou "assistant"
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now()
+    )
 
     customer: Mapped["Customer"] = relationship(back_populates="conversations")
+
+
+def _name_search_index(source: str) -> list[DDL]:
+    """Tabela FTS5 espelhando a coluna name da tabela source, sincronizada por triggers"""
+    fts = f"{source}_fts"
+    return [
+        DDL(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"name, content='{source}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name ON {source} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+            f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+        ),
+        # Reindexa linhas gravadas antes de o índice existir
+        DDL(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"),
+    ]
+
+
+# Índices de busca por nome usados pelo agente (BarberService/ServiceService.get_by_name)
+barbers_fts = table("barbers_fts", column("rowid", Integer), column("name", String))
+services_fts = table("services_fts", column("rowid", Integer), column("name", String))
+
+for _ddl in _name_search_index("barbers") + _name_search_index("services"):
+    event.listen(Base.metadata, "after_create", _ddl.execute_if(dialect="sqlite"))
@@ -1,8 +1,9 @@
 from datetime import datetime
 from typing import Optional
+import msgspec
 from pydantic import BaseModel
 
-from app.models import AppointmentStatus
+from app.models import AppointmentStatus, Barber, Service, Customer, Appointment
 
 
 # Barber Schemas
@@ -21,6 +22,18 @@ class BarberResponse(BarberBase):
     is_active: bool
     created_at: datetime
 
+    @classmethod
+    def from_orm_fast(cls, barber: Barber) -> "BarberResponse":
+        """Monta a resposta sem revalidar dados que já vieram do banco"""
+        return cls.model_construct(
+            id=barber.id,
+            name=barber.name,
+            phone=barber.phone,
+            specialty=barber.specialty,
+            is_active=barber.is_active,
+            created_at=barber.created_at,
+        )
+
     class Config:
         from_attributes = True
 
@@ -42,6 +55,19 @@ class ServiceResponse(ServiceBase):
     is_active: bool
     created_at: datetime
 
+    @classmethod
+    def from_orm_fast(cls, service: Service) -> "ServiceResponse":
+        """Monta a resposta sem revalidar dados que já vieram do banco"""
+        return cls.model_construct(
+            id=service.id,
+            name=service.name,
+            description=service.description,
+            duration_minutes=service.duration_minutes,
+            price=service.price,
+            is_active=service.is_active,
+            created_at=service.created_at,
+        )
+
     class Config:
         from_attributes = True
 
@@ -61,6 +87,17 @@ class CustomerResponse(CustomerBase):
     created_at: datetime
     last_interaction: datetime
 
+    @classmethod
+    def from_orm_fast(cls, customer: Customer) -> "CustomerResponse":
+        """Monta a resposta sem revalidar dados que já vieram do banco"""
+        return cls.model_construct(
+            id=customer.id,
+            phone=customer.phone,
+            name=customer.name,
+            created_at=customer.created_at,
+            last_interaction=customer.last_interaction,
+        )
+
     class Config:
         from_attributes = True
 
@@ -87,20 +124,34 @@ class AppointmentResponse(BaseModel):
     barber: BarberResponse
     service: ServiceResponse
 
+    @classmethod
+    def from_orm_fast(cls, appointment: Appointment) -> "AppointmentResponse":
+        """Monta a resposta sem revalidar dados que já vieram do banco.
+
+        Requer customer, barber e service já carregados no agendamento.
+        """
+        return cls.model_construct(
+            id=appointment.id,
+            scheduled_at=appointment.scheduled_at,
+            status=appointment.status,
+            notes=appointment.notes,
+            created_at=appointment.created_at,
+            customer=CustomerResponse.from_orm_fast(appointment.customer),
+            barber=BarberResponse.from_orm_fast(appointment.barber),
+            service=ServiceResponse.from_orm_fast(appointment.service),
+        )
+
     class Config:
         from_attributes = True
 
 
-class AppointmentSummary(BaseModel):
+class AppointmentSummary(msgspec.Struct, frozen=True):
     id: int
     scheduled_at: datetime
     status: AppointmentStatus
     barber_name: str
     service_name: str
 
-    class Config:
-        from_attributes = True
-
 
 # WhatsApp Webhook Schemas
 class WhatsAppMessage(BaseModel):
@@ -1,39 +1,232 @@
+import asyncio
+import functools
+import inspect
+import logging
+import sqlite3
+import time
 from datetime import datetime, timedelta
 from typing import Optional
-from sqlalchemy import select, and_, or_
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+import msgspec
+import orjson
+from fastapi import Response
+from sqlalchemy import select, insert, and_, func, literal, lambda_stmt, bindparam, DateTime, Row
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import aliased, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models import Barber, Service, Customer, Appointment, Conversation, AppointmentStatus
+from app.database import Base
+from app.models import (
+    ACTIVE_STATUSES, Barber, Service, Customer, Appointment, Conversation, AppointmentStatus,
+    barbers_fts, services_fts
+)
+from app.schemas import AppointmentSummary
+
+logger = logging.getLogger(__name__)
+
+
+class _EntitySnapshot:
+    """Cópia imutável das colunas de uma entidade, independente da sessão que a carregou"""
+
+    __slots__ = ("model", "values")
+
+    def __init__(self, entity: Base):
+        self.model = type(entity)
+        self.values = tuple(
+            (attr.key, getattr(entity, attr.key)) for attr in self.model.__mapper__.column_attrs
+        )
+
+    async def restore(self, db: AsyncSession) -> Base:
+        """Recria a entidade já persistida dentro da sessão do chamador, sem consultar o banco"""
+        entity = self.model(**dict(self.values))
+        make_transient_to_detached(entity)
+        return await db.merge(entity, load=False)
+
+
+class _ListSnapshot(tuple):
+    """Lista de resultados guardada no cache como tupla imutável"""
+
+
+class _TTLCache:
+    """Cache em memória com expiração para dados de referência (barbeiros e serviços).
+
+    Guarda snapshots das entidades, nunca as instâncias de uma sessão: cada leitura do
+    cache recebe uma instância nova, ligada à sua própria sessão.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[tuple, tuple[float, object]] = {}
+
+    @staticmethod
+    def _snapshot(value):
+        if isinstance(value, list):
+            return _ListSnapshot(_TTLCache._snapshot(item) for item in value)
+        if isinstance(value, Base):
+            return _EntitySnapshot(value)
+        return value
+
+    @staticmethod
+    async def _restore(db: AsyncSession, value):
+        if isinstance(value, _ListSnapshot):
+            return [await _TTLCache._restore(db, item) for item in value]
+        if isinstance(value, _EntitySnapshot):
+            return await value.restore(db)
+        return value
+
+    def _set(self, key: tuple, value) -> None:
+        now = time.monotonic()
+        for expired in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[expired]
+        self._entries.pop(key, None)
+        # Descarta as entradas mais antigas ao atingir o limite
+        while len(self._entries) >= self.maxsize:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + self.ttl, value)
+
+    def cached(self, method):
+        """Decorator para métodos async de leitura, com chave pelo método e argumentos"""
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(service, *args, **kwargs):
+            bound = signature.bind(service, *args, **kwargs)
+            bound.apply_defaults()
+            # O bind faz parte da chave: entradas de um banco nunca servem sessões de outro
+            key = (service.db.bind, method.__qualname__, *tuple(bound.arguments.items())[1:])
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return await self._restore(service.db, entry[1])
+
+            value = await method(service, *args, **kwargs)
+            self._set(key, self._snapshot(value))
+            return value
+        return wrapper
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Barbeiros e serviços mudam raramente e são consultados a cada mensagem do agente.
+# Limpo em qualquer escrita feita por BarberService/ServiceService.
+_reference_cache = _TTLCache(ttl=60, maxsize=256)
+
+
+def _sqlite_datetime(value: datetime):
+    """Normaliza um datetime para o formato de datetime() do SQLite"""
+    return func.datetime(literal(value, DateTime), type_=DateTime)
+
+
+def _appointment_end():
+    """Horário de término do agendamento (início + duração do serviço), calculado no SQL"""
+    return func.datetime(
+        Appointment.scheduled_at, func.printf("+%d minutes", Service.duration_minutes)
+    )
+
+
+def _name_search_query(name: str) -> Optional[str]:
+    """Converte o nome digitado em uma consulta FTS5 por prefixo de cada palavra"""
+    terms = [term.replace('"', '""') for term in name.split()]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _serialize_appointments(appointments: list[Appointment]) -> bytes:
+    """Serializa agendamentos no formato de AppointmentResponse direto com orjson"""
+    return orjson.dumps([
+        {
+            "id": apt.id,
+            "scheduled_at": apt.scheduled_at,
+            "status": apt.status,
+            "notes": apt.notes,
+            "created_at": apt.created_at,
+            "customer": {
+                "id": apt.customer.id,
+                "phone": apt.customer.phone,
+                "name": apt.customer.name,
+                "created_at": apt.customer.created_at,
+                "last_interaction": apt.customer.last_interaction,
+            },
+            "barber": {
+                "id": apt.barber.id,
+                "name": apt.barber.name,
+                "phone": apt.barber.phone,
+                "specialty": apt.barber.specialty,
+                "is_active": apt.barber.is_active,
+                "created_at": apt.barber.created_at,
+            },
+            "service": {
+                "id": apt.service.id,
+                "name": apt.service.name,
+                "description": apt.service.description,
+                "duration_minutes": apt.service.duration_minutes,
+                "price": apt.service.price,
+                "is_active": apt.service.is_active,
+                "created_at": apt.service.created_at,
+            },
+        }
+        for apt in appointments
+    ])
+
+
+def appointments_json_response(appointments: list[Appointment]) -> Response:
+    """Resposta JSON pronta para endpoints de agendamentos, sem passar pelo jsonable_encoder"""
+    return Response(content=_serialize_appointments(appointments), media_type="application/json")
+
+
+def appointment_summaries_json_response(summaries: list[AppointmentSummary]) -> Response:
+    """Resposta JSON de resumos de agendamento codificada com msgspec"""
+    return Response(content=msgspec.json.encode(summaries), media_type="application/json")
 
 
 class BarberService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @_reference_cache.cached
     async def get_all_active(self) -> list[Barber]:
         result = await self.db.execute(
-            select(Barber).where(Barber.is_active == True)
+            lambda_stmt(lambda: select(Barber).where(Barber.is_active.is_(True)))
         )
         return list(result.scalars().all())
 
+    @_reference_cache.cached
+    async def get_all_active_summary(self) -> list[Row]:
+        """Lista barbeiros ativos apenas com as colunas usadas pelo agente"""
+        result = await self.db.execute(
+            select(Barber.id, Barber.name, Barber.specialty).where(Barber.is_active.is_(True))
+        )
+        return list(result.all())
+
+    @_reference_cache.cached
     async def get_by_id(self, barber_id: int) -> Optional[Barber]:
         result = await self.db.execute(
-            select(Barber).where(Barber.id == barber_id)
+            lambda_stmt(lambda: select(Barber).where(Barber.id == bindparam("barber_id"))),
+            {"barber_id": barber_id},
         )
         return result.scalar_one_or_none()
 
+    @_reference_cache.cached
     async def get_by_name(self, name: str) -> Optional[Barber]:
+        query = _name_search_query(name)
+        if query is None:
+            return None
+
         result = await self.db.execute(
-            select(Barber).where(Barber.name.ilike(f"%{name}%"))
+            select(Barber)
+            .join(barbers_fts, barbers_fts.c.rowid == Barber.id)
+            .where(barbers_fts.c.name.match(query))
         )
         return result.scalar_one_or_none()
 
     async def create(self, name: str, phone: str = None, specialty: str = None) -> Barber:
-        barber = Barber(name=name, phone=phone, specialty=specialty)
-        self.db.add(barber)
+        barber = await self.db.scalar(
+            insert(Barber).values(name=name, phone=phone, specialty=specialty).returning(Barber)
+        )
         await self.db.commit()
-        await self.db.refresh(barber)
+        _reference_cache.clear()
         return barber
 
 
@@ -41,33 +234,58 @@ class ServiceService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @_reference_cache.cached
     async def get_all_active(self) -> list[Service]:
         result = await self.db.execute(
-            select(Service).where(Service.is_active == True)
+            lambda_stmt(lambda: select(Service).where(Service.is_active.is_(True)))
         )
         return list(result.scalars().all())
 
+    @_reference_cache.cached
+    async def get_all_active_summary(self) -> list[Row]:
+        """Lista serviços ativos apenas com as colunas usadas pelo agente"""
+        result = await self.db.execute(
+            select(
+                Service.id, Service.name, Service.duration_minutes, Service.price
+            ).where(Service.is_active.is_(True))
+        )
+        return list(result.all())
+
+    @_reference_cache.cached
     async def get_by_id(self, service_id: int) -> Optional[Service]:
         result = await self.db.execute(
-            select(Service).where(Service.id == service_id)
+            lambda_stmt(lambda: select(Service).where(Service.id == bindparam("service_id"))),
+            {"service_id": service_id},
         )
         return result.scalar_one_or_none()
 
+    @_reference_cache.cached
     async def get_by_name(self, name: str) -> Optional[Service]:
+        query = _name_search_query(name)
+        if query is None:
+            return None
+
         result = await self.db.execute(
-            select(Service).where(Service.name.ilike(f"%{name}%"))
+            select(Service)
+            .join(services_fts, services_fts.c.rowid == Service.id)
+            .where(services_fts.c.name.match(query))
         )
         return result.scalar_one_or_none()
 
     async def create(
         self, name: str, description: str = None, duration_minutes: int = 30, price: float = 0.0
     ) -> Service:
-        service = Service(
-            name=name, description=description, duration_minutes=duration_minutes, price=price
+        service = await self.db.scalar(
+            insert(Service)
+            .values(
+                name=name, description=description, duration_minutes=duration_minutes, price=price
+            )
+            .returning(Service)
         )
-        self.db.add(service)
+        # O RETURNING do SQLite devolve REAL sem parte fracionária como int (30.0 -> 30)
+        set_committed_value(service, "price", float(service.price))
         await self.db.commit()
-        await self.db.refresh(service)
+        _reference_cache.clear()
         return service
 
 
@@ -76,16 +294,13 @@ class CustomerService:
         self.db = db
 
     async def get_or_create(self, phone: str, name: str = None) -> Customer:
-        result = await self.db.execute(
-            select(Customer).where(Customer.phone == phone)
-        )
-        customer = result.scalar_one_or_none()
+        customer = await self.get_by_phone(phone)
 
         if not customer:
-            customer = Customer(phone=phone, name=name)
-            self.db.add(customer)
+            customer = await self.db.scalar(
+                insert(Customer).values(phone=phone, name=name).returning(Customer)
+            )
             await self.db.commit()
-            await self.db.refresh(customer)
         elif name and not customer.name:
             customer.name = name
             await self.db.commit()
@@ -94,7 +309,8 @@ class CustomerService:
 
     async def get_by_phone(self, phone: str) -> Optional[Customer]:
         result = await self.db.execute(
-            select(Customer).where(Customer.phone == phone)
+            lambda_stmt(lambda: select(Customer).where(Customer.phone == bindparam("phone"))),
+            {"phone": phone},
         )
         return result.scalar_one_or_none()
 
@@ -119,29 +335,34 @@ class AppointmentService:
         scheduled_at: datetime,
         notes: str = None
     ) -> Appointment:
-        appointment = Appointment(
-            customer_id=customer_id,
-            barber_id=barber_id,
-            service_id=service_id,
-            scheduled_at=scheduled_at,
-            notes=notes
+        appointment = await self.db.scalar(
+            insert(Appointment)
+            .values(
+                customer_id=customer_id,
+                barber_id=barber_id,
+                service_id=service_id,
+                scheduled_at=scheduled_at,
+                notes=notes
+            )
+            .returning(Appointment)
         )
-        self.db.add(appointment)
         await self.db.commit()
-        await self.db.refresh(appointment)
         return appointment
 
     async def get_by_id(self, appointment_id: int) -> Optional[Appointment]:
         result = await self.db.execute(
-            select(Appointment)
-            .options(
-                selectinload(Appointment.customer),
-                selectinload(Appointment.barber),
-                selectinload(Appointment.service)
-            )
-            .where(Appointment.id == appointment_id)
+            lambda_stmt(
+                lambda: select(Appointment)
+                .options(
+                    joinedload(Appointment.customer, innerjoin=True),
+                    joinedload(Appointment.barber, innerjoin=True),
+                    joinedload(Appointment.service, innerjoin=True)
+                )
+                .where(Appointment.id == bindparam("appointment_id"))
+            ),
+            {"appointment_id": appointment_id},
         )
-        return result.scalar_one_or_none()
+        return result.unique().scalar_one_or_none()
 
     async def get_customer_appointments(
         self, customer_phone: str, upcoming_only: bool = False
@@ -153,15 +374,15 @@ class AppointmentService:
             return []
 
         query = select(Appointment).options(
-            selectinload(Appointment.barber),
-            selectinload(Appointment.service)
+            joinedload(Appointment.barber, innerjoin=True),
+            joinedload(Appointment.service, innerjoin=True)
         ).where(Appointment.customer_id == customer.id)
 
         if upcoming_only:
             query = query.where(
                 and_(
                     Appointment.scheduled_at >= datetime.utcnow(),
-                    Appointment.status.in_([AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED])
+                    Appointment.status.in_(ACTIVE_STATUSES)
                 )
             )
 
@@ -169,6 +390,36 @@ class AppointmentService:
         result = await self.db.execute(query)
         return list(result.scalars().all())
 
+    async def get_customer_appointment_summaries(
+        self, customer_phone: str, upcoming_only: bool = False
+    ) -> list[AppointmentSummary]:
+        """Resumo dos agendamentos do cliente, sem carregar as entidades relacionadas"""
+        query = (
+            select(
+                Appointment.id,
+                Appointment.scheduled_at,
+                Appointment.status,
+                Barber.name.label("barber_name"),
+                Service.name.label("service_name"),
+            )
+            .join(Customer, Appointment.customer_id == Customer.id)
+            .join(Barber, Appointment.barber_id == Barber.id)
+            .join(Service, Appointment.service_id == Service.id)
+            .where(Customer.phone == customer_phone)
+        )
+
+        if upcoming_only:
+            query = query.where(
+                and_(
+                    Appointment.scheduled_at >= datetime.utcnow(),
+                    Appointment.status.in_(ACTIVE_STATUSES)
+                )
+            )
+
+        query = query.order_by(Appointment.scheduled_at.desc())
+        result = await self.db.execute(query)
+        return [AppointmentSummary(**row._mapping) for row in result]
+
     async def get_barber_appointments(
         self, barber_id: int, date: datetime
     ) -> list[Appointment]:
@@ -177,13 +428,13 @@ class AppointmentService:
 
         result = await self.db.execute(
             select(Appointment)
-            .options(selectinload(Appointment.service))
+            .options(joinedload(Appointment.service, innerjoin=True))
             .where(
                 and_(
                     Appointment.barber_id == barber_id,
                     Appointment.scheduled_at >= start_of_day,
                     Appointment.scheduled_at < end_of_day,
-                    Appointment.status.in_([AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED])
+                    Appointment.status.in_(ACTIVE_STATUSES)
                 )
             )
             .order_by(Appointment.scheduled_at)
@@ -196,26 +447,19 @@ class AppointmentService:
         """Verifica se o horário está disponível para o barbeiro"""
         end_time = scheduled_at + timedelta(minutes=duration_minutes)
 
-        result = await self.db.execute(
-            select(Appointment).where(
-                and_(
-                    Appointment.barber_id == barber_id,
-                    Appointment.status.in_([AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED]),
-                    or_(
-                        and_(
-                            Appointment.scheduled_at <= scheduled_at,
-                            Appointment.scheduled_at + timedelta(minutes=30) > scheduled_at
-                        ),
-                        and_(
-                            Appointment.scheduled_at < end_time,
-                            Appointment.scheduled_at >= scheduled_at
-                        )
-                    )
-                )
+        # Sobreposição de intervalos usando a duração real do serviço de cada agendamento
+        conflict = (
+            select(Appointment.id)
+            .join(Service, Appointment.service_id == Service.id)
+            .where(
+                Appointment.barber_id == barber_id,
+                Appointment.status.in_(ACTIVE_STATUSES),
+                Appointment.scheduled_at < end_time,
+                _appointment_end() > _sqlite_datetime(scheduled_at),
             )
         )
-        existing = result.scalar_one_or_none()
-        return existing is None
+        is_taken = await self.db.scalar(select(conflict.exists()))
+        return not is_taken
 
     async def get_available_slots(
         self, barber_id: int, date: datetime, service_duration: int = 30
@@ -227,42 +471,48 @@ class AppointmentService:
         if not barber:
             return []
 
-        existing_appointments = await self.get_barber_appointments(barber_id, date)
-        blocked_times = set()
-
-        for apt in existing_appointments:
-            # Assume 30 min por serviço se não tiver duração específica
-            apt_duration = apt.service.duration_minutes if apt.service else 30
-            current = apt.scheduled_at
-            while current < apt.scheduled_at + timedelta(minutes=apt_duration):
-                blocked_times.add(current.replace(second=0, microsecond=0))
-                current += timedelta(minutes=30)
-
-        available_slots = []
         start_of_day = date.replace(
             hour=barber.work_start.hour, minute=barber.work_start.minute, second=0, microsecond=0
         )
         end_of_day = date.replace(
             hour=barber.work_end.hour, minute=barber.work_end.minute, second=0, microsecond=0
         )
+        last_slot = end_of_day - timedelta(minutes=service_duration)
 
-        current_slot = start_of_day
-        while current_slot + timedelta(minutes=service_duration) <= end_of_day:
-            # Verifica se todos os slots necessários estão livres
-            is_available = True
-            check_time = current_slot
-            while check_time < current_slot + timedelta(minutes=service_duration):
-                if check_time in blocked_times:
-                    is_available = False
-                    break
-                check_time += timedelta(minutes=30)
+        if last_slot < start_of_day:
+            return []
 
-            if is_available and current_slot > datetime.utcnow():
-                available_slots.append(current_slot)
+        # Gera os slots de 30 min do expediente com uma CTE recursiva
+        slots = select(_sqlite_datetime(start_of_day).label("slot_start")).cte(
+            "slots", recursive=True
+        )
+        next_slot = func.datetime(slots.c.slot_start, "+30 minutes")
+        slots = slots.union_all(
+            select(next_slot).where(next_slot <= _sqlite_datetime(last_slot))
+        )
 
-            current_slot += timedelta(minutes=30)
+        # Um slot está ocupado se algum agendamento ativo se sobrepõe a ele
+        slot_end = func.datetime(slots.c.slot_start, f"+{service_duration} minutes")
+        conflict = (
+            select(Appointment.id)
+            .join(Service, Appointment.service_id == Service.id)
+            .where(
+                Appointment.barber_id == barber_id,
+                Appointment.status.in_(ACTIVE_STATUSES),
+                Appointment.scheduled_at < slot_end,
+                _appointment_end() > slots.c.slot_start,
+            )
+        )
 
-        return available_slots
+        result = await self.db.execute(
+            select(slots.c.slot_start)
+            .where(
+                ~conflict.exists(),
+                slots.c.slot_start > _sqlite_datetime(datetime.utcnow()),
+            )
+            .order_by(slots.c.slot_start)
+        )
+        return list(result.scalars().all())
 
     async def cancel(self, appointment_id: int) -> Optional[Appointment]:
         appointment = await self.get_by_id(appointment_id)
@@ -280,54 +530,234 @@ class AppointmentService:
         if not customer:
             return []
 
+        latest_visit = func.max(Appointment.scheduled_at)
         result = await self.db.execute(
-            select(Appointment)
-            .options(selectinload(Appointment.barber), selectinload(Appointment.service))
+            select(
+                Appointment.barber_id,
+                Barber.name,
+                func.count(Appointment.id),
+                latest_visit,
+                func.json_group_array(Service.name.distinct()),
+            )
+            .join(Barber, Appointment.barber_id == Barber.id)
+            .join(Service, Appointment.service_id == Service.id)
             .where(Appointment.customer_id == customer.id)
-            .order_by(Appointment.scheduled_at.desc())
+            .group_by(Appointment.barber_id, Barber.name)
+            .order_by(latest_visit.desc())
         )
 
-        appointments = result.scalars().all()
-        barber_history = {}
-
-        for apt in appointments:
-            if apt.barber_id not in barber_history:
-                barber_history[apt.barber_id] = {
-                    "barber_id": apt.barber_id,
-                    "barber_name": apt.barber.name,
-                    "total_visits": 0,
-                    "last_visit": apt.scheduled_at,
-                    "services_used": set()
-                }
-            barber_history[apt.barber_id]["total_visits"] += 1
-            barber_history[apt.barber_id]["services_used"].add(apt.service.name)
-
-        # Converte sets para lists para serialização
-        for bh in barber_history.values():
-            bh["services_used"] = list(bh["services_used"])
-
-        return list(barber_history.values())
+        return [
+            {
+                "barber_id": barber_id,
+                "barber_name": barber_name,
+                "total_visits": total_visits,
+                "last_visit": last_visit,
+                "services_used": orjson.loads(services_used),
+            }
+            for barber_id, barber_name, total_visits, last_visit, services_used in result
+        ]
+
+
+_CONVERSATION_BATCH_SIZE = 8
+_CONVERSATION_FLUSH_INTERVAL = 0.05
+
+
+class ConversationWriteError(Exception):
+    """Mensagens de conversa que não puderam ser gravadas"""
+
+    def __init__(self, rows: list[dict]):
+        super().__init__(f"{len(rows)} mensagem(ns) de conversa não gravada(s)")
+        self.rows = rows
+
+
+def _is_database_busy(exc: Exception) -> bool:
+    """Erro de banco ocupado/travado do SQLite (SQLITE_BUSY ou SQLITE_LOCKED)"""
+    orig = getattr(exc, "orig", None)
+    code = getattr(orig, "sqlite_errorcode", None)
+    return code is not None and code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+class _ConversationWriter:
+    """Grava mensagens de conversa em lote (write-behind) em um engine.
+
+    Um commit a cada _CONVERSATION_BATCH_SIZE mensagens ou _CONVERSATION_FLUSH_INTERVAL
+    segundos. As linhas são retiradas da fila e gravadas sem bloquear outros flushes.
+    Se o lote falhar, as linhas são regravadas uma a uma, para que uma linha inválida
+    não descarte mensagens de outros clientes; as que ainda falharem são levantadas
+    como ConversationWriteError no próximo flush do mesmo cliente. Com o banco
+    ocupado, as linhas voltam para a fila e o erro é propagado, sem regravar uma a uma.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._pending: list[dict] = []
+        self._failed: dict[int, list[dict]] = {}
+        # Gravações em andamento -> clientes com linhas nelas
+        self._writes: dict[asyncio.Task, set[int]] = {}
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, row: dict) -> None:
+        self._pending.append(row)
+        if len(self._pending) >= _CONVERSATION_BATCH_SIZE:
+            try:
+                await self._start_write(self._take())
+            except Exception as exc:
+                if not _is_database_busy(exc):
+                    raise
+                logger.warning("Banco ocupado; mensagens mantidas na fila", exc_info=True)
+            self._raise_failures(row["customer_id"])
+        else:
+            self._schedule_flush()
+
+    async def flush(self, customer_id: Optional[int] = None) -> None:
+        """Grava as mensagens pendentes (só as do cliente, se informado) e aguarda as
+        gravações em andamento que as incluam"""
+        writes = [
+            task for task, customers in self._writes.items()
+            if customer_id is None or customer_id in customers
+        ]
+        rows = self._take(customer_id)
+        if rows:
+            writes.append(self._start_write(rows))
+        await asyncio.gather(*writes)
+
+        if customer_id is not None:
+            self._raise_failures(customer_id)
+
+    def _take(self, customer_id: Optional[int] = None) -> list[dict]:
+        if customer_id is None:
+            rows, self._pending = self._pending, []
+        else:
+            rows = [row for row in self._pending if row["customer_id"] == customer_id]
+            self._pending = [row for row in self._pending if row["customer_id"] != customer_id]
+        return rows
+
+    def _schedule_flush(self) -> None:
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(_CONVERSATION_FLUSH_INTERVAL)
+        self._timer = None
+        rows = self._take()
+        if not rows:
+            return
+        try:
+            await self._start_write(rows)
+        except Exception:
+            logger.warning("Banco ocupado; %d mensagens mantidas na fila", len(rows), exc_info=True)
+
+    def _start_write(self, rows: list[dict]) -> asyncio.Task:
+        task = asyncio.create_task(self._write(rows))
+        self._writes[task] = {row["customer_id"] for row in rows}
+        task.add_done_callback(self._writes.pop)
+        return task
+
+    async def _insert(self, rows: list[dict]) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Conversation), rows)
+
+    def _requeue(self, rows: list[dict]) -> None:
+        self._pending[:0] = rows
+        self._schedule_flush()
+
+    async def _write(self, rows: list[dict]) -> None:
+        try:
+            await self._insert(rows)
+            return
+        except Exception as exc:
+            if _is_database_busy(exc):
+                self._requeue(rows)
+                raise
+            logger.exception("Falha ao gravar lote de %d mensagens; gravando uma a uma", len(rows))
+
+        for index, row in enumerate(rows):
+            try:
+                await self._insert([row])
+            except Exception as exc:
+                if _is_database_busy(exc):
+                    self._requeue(rows[index:])
+                    raise
+                logger.exception("Falha ao gravar mensagem do cliente %s", row["customer_id"])
+                self._failed.setdefault(row["customer_id"], []).append(row)
+
+    def _take_failures(self, customer_id: Optional[int] = None) -> list[dict]:
+        if customer_id is None:
+            failed = [row for rows in self._failed.values() for row in rows]
+            self._failed.clear()
+            return failed
+        return self._failed.pop(customer_id, [])
+
+    def _raise_failures(self, customer_id: int) -> None:
+        failed = self._take_failures(customer_id)
+        if failed:
+            raise ConversationWriteError(failed)
+
+
+# Um escritor por engine, para que cada sessão injetada grave no seu próprio banco
+_conversation_writers: dict[AsyncEngine, _ConversationWriter] = {}
+
+
+def _get_conversation_writer(db: AsyncSession) -> _ConversationWriter:
+    engine = db.bind
+    if engine not in _conversation_writers:
+        _conversation_writers[engine] = _ConversationWriter(engine)
+    return _conversation_writers[engine]
+
+
+async def flush_conversations() -> None:
+    """Grava todas as mensagens pendentes de todos os engines. Chamar no shutdown da aplicação"""
+    errors = []
+    for writer in list(_conversation_writers.values()):
+        try:
+            await writer.flush()
+        except Exception as exc:
+            errors.append(exc)
+
+    failed = [row for writer in _conversation_writers.values() for row in writer._take_failures()]
+    if failed:
+        raise ConversationWriteError(failed)
+    if errors:
+        raise errors[0]
 
 
 class ConversationService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def add_message(self, customer_id: int, role: str, content: str) -> Conversation:
-        conversation = Conversation(customer_id=customer_id, role=role, content=content)
-        self.db.add(conversation)
-        await self.db.commit()
-        return conversation
+    async def add_message(self, customer_id: int, role: str, content: str) -> None:
+        """Enfileira a mensagem para gravação em lote no banco da sessão.
+
+        No fluxo do webhook (grava a mensagem, lê o histórico, responde) a mensagem do
+        cliente é gravada logo em seguida por get_recent_messages; o ganho do lote vem
+        das respostas do assistente e de rajadas de vários clientes ao mesmo tempo.
+        """
+        await _get_conversation_writer(self.db).add({
+            "customer_id": customer_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.utcnow(),
+        })
 
     async def get_recent_messages(
         self, customer_id: int, limit: int = 10
     ) -> list[Conversation]:
-        result = await self.db.execute(
+        # Garante que mensagens do cliente ainda pendentes entrem no histórico. Passa por
+        # todos os escritores: a sessão de leitura (get_read_db) tem outro bind, mas as
+        # mensagens ficam no escritor do engine de escrita
+        for writer in list(_conversation_writers.values()):
+            await writer.flush(customer_id)
+
+        # Últimas `limit` mensagens, devolvidas em ordem cronológica
+        latest = (
             select(Conversation)
             .where(Conversation.customer_id == customer_id)
-            .order_by(Conversation.created_at.desc())
+            .order_by(Conversation.created_at.desc(), Conversation.id.desc())
             .limit(limit)
+            .subquery()
+        )
+        recent = aliased(Conversation, latest)
+        result = await self.db.execute(
+            select(recent).order_by(latest.c.created_at, latest.c.id)
         )
-        messages = list(result.scalars().all())
-        messages.reverse()  # Ordem cronológica
-        return messages
+        return list(result.scalars().all())
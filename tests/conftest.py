@@ -0,0 +1,46 @@
+import os
+
+# O engine do módulo app.database não é usado nos testes; cada teste cria o seu
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import services
+from app.database import Base
+from app.services import BarberService, CustomerService, ServiceService
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+
+    writer = services._conversation_writers.pop(engine, None)
+    if writer is not None and writer._timer is not None:
+        writer._timer.cancel()
+    services._reference_cache.clear()
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def db(session_factory):
+    async with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+async def shop(db):
+    """Barbeiro (9h-19h), serviços de 30 e 60 minutos e um cliente"""
+    barber = await BarberService(db).create("João")
+    haircut = await ServiceService(db).create("Corte", duration_minutes=30)
+    haircut_and_beard = await ServiceService(db).create("Corte e Barba", duration_minutes=60)
+    customer = await CustomerService(db).get_or_create("5511999990000", "Ana")
+    return barber, haircut, haircut_and_beard, customer
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from app.services import AppointmentService
+
+
+def tomorrow_at(hour: int, minute: int = 0) -> datetime:
+    day = datetime.utcnow() + timedelta(days=1)
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def as_times(slots: list[datetime]) -> list[tuple[int, int]]:
+    return [(slot.hour, slot.minute) for slot in slots]
+
+
+async def test_booking_inside_longer_service_is_taken(db, shop):
+    barber, _, haircut_and_beard, customer = shop
+    appointments = AppointmentService(db)
+    await appointments.create(customer.id, barber.id, haircut_and_beard.id, tomorrow_at(10))
+
+    assert not await appointments.check_availability(barber.id, tomorrow_at(10, 30), 30)
+    assert not await appointments.check_availability(barber.id, tomorrow_at(9, 30), 60)
+    assert await appointments.check_availability(barber.id, tomorrow_at(9), 60)
+    assert await appointments.check_availability(barber.id, tomorrow_at(11), 30)
+
+
+async def test_cancelled_appointment_frees_the_time(db, shop):
+    barber, haircut, _, customer = shop
+    appointments = AppointmentService(db)
+    appointment = await appointments.create(customer.id, barber.id, haircut.id, tomorrow_at(10))
+    await appointments.cancel(appointment.id)
+
+    assert await appointments.check_availability(barber.id, tomorrow_at(10), 30)
+
+
+async def test_available_slots_cover_the_working_day(db, shop):
+    barber, *_ = shop
+
+    slots = as_times(await AppointmentService(db).get_available_slots(barber.id, tomorrow_at(0)))
+
+    assert slots[0] == (9, 0)
+    assert slots[-1] == (18, 30)
+    assert len(slots) == 20
+
+
+async def test_available_slots_skip_booking_on_the_grid(db, shop):
+    barber, _, haircut_and_beard, customer = shop
+    appointments = AppointmentService(db)
+    await appointments.create(customer.id, barber.id, haircut_and_beard.id, tomorrow_at(10))
+
+    slots = as_times(await appointments.get_available_slots(barber.id, tomorrow_at(0), 30))
+
+    assert (9, 30) in slots
+    assert (10, 0) not in slots
+    assert (10, 30) not in slots
+    assert (11, 0) in slots
+
+
+async def test_available_slots_skip_booking_off_the_grid(db, shop):
+    barber, haircut, _, customer = shop
+    appointments = AppointmentService(db)
+    await appointments.create(customer.id, barber.id, haircut.id, tomorrow_at(14, 15))
+
+    slots = as_times(await appointments.get_available_slots(barber.id, tomorrow_at(0), 30))
+
+    assert (13, 30) in slots
+    assert (14, 0) not in slots
+    assert (14, 30) not in slots
+    assert (15, 0) in slots
+
+
+async def test_available_slots_respect_requested_duration(db, shop):
+    barber, haircut, _, customer = shop
+    appointments = AppointmentService(db)
+    await appointments.create(customer.id, barber.id, haircut.id, tomorrow_at(14, 15))
+
+    slots = as_times(await appointments.get_available_slots(barber.id, tomorrow_at(0), 60))
+
+    assert (13, 0) in slots
+    assert (13, 30) not in slots
+    assert (14, 30) not in slots
+    assert (14, 45) not in slots
+    assert slots[-1] == (18, 0)
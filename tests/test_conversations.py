@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import services
+from app.database import Base
+from app.models import Conversation
+from app.services import (
+    _CONVERSATION_BATCH_SIZE, _CONVERSATION_FLUSH_INTERVAL, ConversationService,
+    ConversationWriteError, CustomerService, flush_conversations
+)
+
+
+async def stored(engine, customer_id: int) -> list[str]:
+    """Mensagens já gravadas no banco, lidas por fora do escritor"""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(Conversation.content)
+            .where(Conversation.customer_id == customer_id)
+            .order_by(Conversation.created_at, Conversation.id)
+        )
+        return list(result.scalars().all())
+
+
+@pytest.fixture
+async def customers(db):
+    customer_service = CustomerService(db)
+    return (
+        await customer_service.get_or_create("5511900000001"),
+        await customer_service.get_or_create("5511900000002"),
+    )
+
+
+async def test_message_is_written_by_the_timer(db, engine, customers):
+    customer, _ = customers
+    await ConversationService(db).add_message(customer.id, "user", "oi")
+
+    assert await stored(engine, customer.id) == []
+    await asyncio.sleep(_CONVERSATION_FLUSH_INTERVAL * 4)
+    assert await stored(engine, customer.id) == ["oi"]
+
+
+async def test_full_batch_is_written_immediately(db, engine, customers):
+    customer, _ = customers
+    conversations = ConversationService(db)
+    for i in range(_CONVERSATION_BATCH_SIZE):
+        await conversations.add_message(customer.id, "user", f"m{i}")
+
+    assert await stored(engine, customer.id) == [
+        f"m{i}" for i in range(_CONVERSATION_BATCH_SIZE)
+    ]
+
+
+async def test_recent_messages_flush_only_that_customer(db, engine, customers):
+    customer, other = customers
+    conversations = ConversationService(db)
+    await conversations.add_message(customer.id, "user", "oi")
+    await conversations.add_message(other.id, "user", "olá")
+
+    messages = await conversations.get_recent_messages(customer.id)
+
+    assert [m.content for m in messages] == ["oi"]
+    assert await stored(engine, other.id) == []
+
+
+async def test_recent_messages_are_chronological(db, customers):
+    customer, _ = customers
+    conversations = ConversationService(db)
+    for i in range(12):
+        await conversations.add_message(customer.id, "user", f"m{i}")
+
+    messages = await conversations.get_recent_messages(customer.id, limit=3)
+
+    assert [m.content for m in messages] == ["m9", "m10", "m11"]
+
+
+async def test_read_session_sees_buffered_messages(db, engine, customers):
+    customer, _ = customers
+    await ConversationService(db).add_message(customer.id, "user", "oi")
+
+    # Outro engine no mesmo arquivo, como o de get_read_db
+    read_engine = create_async_engine(engine.url)
+    try:
+        async with async_sessionmaker(read_engine, class_=AsyncSession)() as read_db:
+            messages = await ConversationService(read_db).get_recent_messages(customer.id)
+    finally:
+        await read_engine.dispose()
+
+    assert [m.content for m in messages] == ["oi"]
+
+
+async def test_invalid_row_does_not_drop_other_messages(db, engine, customers):
+    customer, other = customers
+    conversations = ConversationService(db)
+    await conversations.add_message(customer.id, "user", "oi")
+    await conversations.add_message(other.id, "user", None)
+    await asyncio.sleep(_CONVERSATION_FLUSH_INTERVAL * 4)
+
+    assert [m.content for m in await conversations.get_recent_messages(customer.id)] == ["oi"]
+
+    with pytest.raises(ConversationWriteError) as error:
+        await conversations.get_recent_messages(other.id)
+    assert [row["customer_id"] for row in error.value.rows] == [other.id]
+
+    # A falha é reportada uma única vez
+    assert await conversations.get_recent_messages(other.id) == []
+
+
+async def test_flush_conversations_writes_every_engine_before_raising(
+    db, engine, customers, tmp_path
+):
+    customer, _ = customers
+    failing_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'other.db'}")
+    async with failing_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    try:
+        async with async_sessionmaker(failing_engine, class_=AsyncSession)() as failing_db:
+            await ConversationService(failing_db).add_message(customer.id, "user", None)
+        await ConversationService(db).add_message(customer.id, "user", "oi")
+
+        with pytest.raises(ConversationWriteError):
+            await flush_conversations()
+    finally:
+        services._conversation_writers.pop(failing_engine, None)
+        await failing_engine.dispose()
+
+    assert await stored(engine, customer.id) == ["oi"]